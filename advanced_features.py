@@ -1,92 +1,139 @@
 import cv2
 import numpy as np
 import streamlit as st
-from PIL import Image, ImageFilter, ImageEnhance
+import atexit
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+@st.cache_resource
+def _plot_libs():
+    import pandas as pd
+    import plotly.express as px
+    return pd, px
+
+@st.cache_data(show_spinner=False)
+def _build_gesture_figure(gesture_items):
+    pd, px = _plot_libs()
+
+    df_gestures = pd.DataFrame(
+        list(gesture_items),
+        columns=['Gesture', 'Count']
+    )
+
+    fig = px.pie(df_gestures, values='Count', names='Gesture',
+               title="Gesture Usage Distribution")
+    return fig
+
 class AdvancedFeatures:
     
     def __init__(self):
         self.session_start_time = datetime.now()
         self.drawing_sessions = []
         self.gesture_analytics = {}
+        self._gesture_total = 0
+        self._gesture_most_used = None
         self.performance_metrics = {}
+        self._scratch = None
+        self._overlay_cache = {}
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+        atexit.register(self._io_pool.shutdown, wait=True)
         
     def create_advanced_sidebar(self):
         st.sidebar.markdown("---")
-        st.sidebar.subheader("Advanced Features")
-        
-        drawing_mode = st.sidebar.selectbox(
-            "Drawing Mode",
-            ["Continuous", "Dots Only", "Lines Only", "Shapes"],
-            help="Choose how drawing strokes are rendered"
-        )
-        
-        st.sidebar.subheader("Canvas Effects")
-        apply_blur = st.sidebar.checkbox("Blur Effect")
-        apply_glow = st.sidebar.checkbox("Glow Effect")
-        apply_shadow = st.sidebar.checkbox("Drop Shadow")
-        
-        st.sidebar.subheader("AI Analysis")
-        analysis_depth = st.sidebar.select_slider(
-            "Analysis Depth",
-            options=["Basic", "Detailed", "Creative", "Educational"],
-            value="Basic"
-        )
-        
-        auto_recognize = st.sidebar.checkbox(
-            "Auto Recognition",
-            help="Automatically recognize drawings after 3 seconds of inactivity"
-        )
-        
-        st.sidebar.subheader("Performance")
-        show_fps = st.sidebar.checkbox("Show FPS")
-        show_latency = st.sidebar.checkbox("Show Latency")
-        
-        return {
-            'drawing_mode': drawing_mode,
-            'apply_blur': apply_blur,
-            'apply_glow': apply_glow,
-            'apply_shadow': apply_shadow,
-            'analysis_depth': analysis_depth.lower(),
-            'auto_recognize': auto_recognize,
-            'show_fps': show_fps,
-            'show_latency': show_latency
-        }
+
+        if 'advanced_settings' not in st.session_state:
+            st.session_state.advanced_settings = {
+                'drawing_mode': 'Continuous',
+                'apply_blur': False,
+                'apply_glow': False,
+                'apply_shadow': False,
+                'analysis_depth': 'basic',
+                'auto_recognize': False,
+                'show_fps': False,
+                'show_latency': False
+            }
+
+        # A form defers the Streamlit rerun until Apply is pressed, instead of
+        # rerunning the whole script on every individual widget change.
+        with st.sidebar.form("advanced_settings_form"):
+            st.subheader("Advanced Features")
+
+            drawing_mode = st.selectbox(
+                "Drawing Mode",
+                ["Continuous", "Dots Only", "Lines Only", "Shapes"],
+                help="Choose how drawing strokes are rendered"
+            )
+
+            st.subheader("Canvas Effects")
+            apply_blur = st.checkbox("Blur Effect")
+            apply_glow = st.checkbox("Glow Effect")
+            apply_shadow = st.checkbox("Drop Shadow")
+
+            st.subheader("AI Analysis")
+            analysis_depth = st.select_slider(
+                "Analysis Depth",
+                options=["Basic", "Detailed", "Creative", "Educational"],
+                value="Basic"
+            )
+
+            auto_recognize = st.checkbox(
+                "Auto Recognition",
+                help="Automatically recognize drawings after 3 seconds of inactivity"
+            )
+
+            st.subheader("Performance")
+            show_fps = st.checkbox("Show FPS")
+            show_latency = st.checkbox("Show Latency")
+
+            submitted = st.form_submit_button("Apply")
+
+        if submitted:
+            st.session_state.advanced_settings = {
+                'drawing_mode': drawing_mode,
+                'apply_blur': apply_blur,
+                'apply_glow': apply_glow,
+                'apply_shadow': apply_shadow,
+                'analysis_depth': analysis_depth.lower(),
+                'auto_recognize': auto_recognize,
+                'show_fps': show_fps,
+                'show_latency': show_latency
+            }
+
+        return st.session_state.advanced_settings
     
     def apply_canvas_effects(self, canvas, effects):
         if canvas is None:
             return canvas
-        
+
+        if not any(effects.get(k) for k in ('apply_blur', 'apply_glow', 'apply_shadow')):
+            return canvas
+
+        # The in-place cv2 pipeline below needs a dense buffer; a strided view
+        # (e.g. canvas[..., ::-1]) would force a hidden copy inside every call.
+        if not canvas.flags['C_CONTIGUOUS']:
+            canvas = np.ascontiguousarray(canvas)
+
         try:
-            canvas_rgb = cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(canvas_rgb)
-            
             if effects.get('apply_blur', False):
-                pil_image = pil_image.filter(ImageFilter.GaussianBlur(radius=1))
-            
+                cv2.GaussianBlur(canvas, (0, 0), 1.0, dst=canvas)
+
             if effects.get('apply_glow', False):
-                glow = pil_image.filter(ImageFilter.GaussianBlur(radius=3))
-                enhancer = ImageEnhance.Brightness(glow)
-                glow = enhancer.enhance(1.5)
-                
-                pil_image = Image.alpha_composite(
-                    glow.convert('RGBA'),
-                    pil_image.convert('RGBA')
-                ).convert('RGB')
-            
+                if self._scratch is None or self._scratch.shape != canvas.shape:
+                    self._scratch = np.empty_like(canvas)
+                cv2.GaussianBlur(canvas, (0, 0), 3.0, dst=self._scratch)
+                cv2.convertScaleAbs(self._scratch, self._scratch, alpha=1.5)
+                cv2.addWeighted(canvas, 1.0, self._scratch, 0.5, 0, dst=canvas)
+
             if effects.get('apply_shadow', False):
-                shadow = Image.new('RGB', pil_image.size, (0, 0, 0))
-                shadow_mask = pil_image.convert('L')
-                shadow.paste(pil_image, (3, 3), shadow_mask)
-                
-                pil_image = Image.blend(shadow, pil_image, 0.8)
-            
-            canvas_with_effects = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-            return canvas_with_effects
-            
+                shadow = np.zeros_like(canvas)
+                shadow[3:, 3:] = canvas[:-3, :-3]
+                cv2.GaussianBlur(shadow, (0, 0), 2.0, dst=shadow)
+                cv2.addWeighted(canvas, 0.8, shadow, 0.2, 0, dst=canvas)
+
+            return canvas
+
         except Exception as e:
             print(f"Effects application error: {e}")
             return canvas
@@ -98,59 +145,70 @@ class AdvancedFeatures:
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                total_gestures = sum(self.gesture_analytics.values())
+                total_gestures = self._gesture_total
                 st.metric("Total Gestures", total_gestures)
-            
+
             with col2:
-                most_used = max(self.gesture_analytics.items(), key=lambda x: x[1])
+                most_used = self._gesture_most_used
                 st.metric("Most Used Gesture", f"{most_used[0]} ({most_used[1]})")
-            
+
             with col3:
                 session_duration = (datetime.now() - self.session_start_time).total_seconds()
                 gestures_per_minute = (total_gestures / session_duration) * 60 if session_duration > 0 else 0
                 st.metric("Gestures/Min", f"{gestures_per_minute:.1f}")
-            
+
             if st.checkbox("Show Gesture Distribution"):
-                import plotly.express as px
-                
-                df_gestures = pd.DataFrame(
-                    list(self.gesture_analytics.items()),
-                    columns=['Gesture', 'Count']
-                )
-                
-                fig = px.pie(df_gestures, values='Count', names='Gesture',
-                           title="Gesture Usage Distribution")
+                fig = _build_gesture_figure(tuple(sorted(self.gesture_analytics.items())))
                 st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No gesture data available yet. Start using gestures to see analytics!")
     
     def track_gesture_usage(self, gesture_name):
         if gesture_name and gesture_name != 'IDLE' and gesture_name != 'UNKNOWN':
-            self.gesture_analytics[gesture_name] = self.gesture_analytics.get(gesture_name, 0) + 1
+            count = self.gesture_analytics.get(gesture_name, 0) + 1
+            self.gesture_analytics[gesture_name] = count
+            self._gesture_total += 1
+            if self._gesture_most_used is None or count > self._gesture_most_used[1]:
+                self._gesture_most_used = (gesture_name, count)
     
     def calculate_fps(self, frame_times):
         if len(frame_times) < 2:
             return 0
-        
-        time_diffs = [frame_times[i] - frame_times[i-1] for i in range(1, len(frame_times))]
-        avg_time_diff = sum(time_diffs) / len(time_diffs)
-        
-        return 1.0 / avg_time_diff if avg_time_diff > 0 else 0
+
+        # Average frame interval is just the total span over (n-1) frames.
+        time_span = frame_times[-1] - frame_times[0]
+        return (len(frame_times) - 1) / time_span if time_span > 0 else 0
     
     def create_performance_overlay(self, img, fps=0, latency=0):
         try:
-            if fps > 0:
-                fps_text = f"FPS: {fps:.1f}"
-                cv2.putText(img, fps_text, (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            if latency > 0:
-                latency_text = f"Latency: {latency:.0f}ms"
-                cv2.putText(img, latency_text, (10, 60), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
-            
+            if fps <= 0 and latency <= 0:
+                return img
+
+            key = (round(fps, 1), int(round(latency)))
+            cached = self._overlay_cache.get(key)
+
+            if cached is None:
+                if len(self._overlay_cache) > 64:
+                    self._overlay_cache.clear()
+
+                tile = np.zeros((70, 260, 3), dtype=np.uint8)
+                if fps > 0:
+                    cv2.putText(tile, f"FPS: {fps:.1f}", (10, 30),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                if latency > 0:
+                    cv2.putText(tile, f"Latency: {latency:.0f}ms", (10, 60),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+
+                cached = (tile, tile.any(axis=2)[:, :, None])
+                self._overlay_cache[key] = cached
+
+            tile, mask = cached
+            roi = img[:tile.shape[0], :tile.shape[1]]
+            np.copyto(roi, tile[:roi.shape[0], :roi.shape[1]],
+                      where=mask[:roi.shape[0], :roi.shape[1]])
+
             return img
-            
+
         except Exception as e:
             print(f"Performance overlay error: {e}")
             return img
@@ -166,13 +224,19 @@ class AdvancedFeatures:
             }
             
             session_file = f"session_{self.session_start_time.strftime('%Y%m%d_%H%M%S')}.json"
-            with open(session_file, 'w') as f:
-                json.dump(session_data, f, indent=2)
-            
+            self._io_pool.submit(self._write_json, session_data, session_file)
+
             return True, session_file
-            
+
         except Exception as e:
             return False, str(e)
+
+    def _write_json(self, data, path, indent=None):
+        try:
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=indent)
+        except Exception as e:
+            print(f"Session write error: {e}")
     
     def create_drawing_templates(self):
         templates = {
@@ -273,22 +337,21 @@ class AdvancedFeatures:
                 },
                 "drawing_statistics": canvas_manager.get_drawing_statistics() if canvas_manager else {},
                 "gesture_analytics": {
-                    "total_gestures": sum(self.gesture_analytics.values()),
+                    "total_gestures": self._gesture_total,
                     "gesture_breakdown": self.gesture_analytics,
-                    "most_used_gesture": max(self.gesture_analytics.items(), key=lambda x: x[1])[0] if self.gesture_analytics else "None"
+                    "most_used_gesture": self._gesture_most_used[0] if self._gesture_most_used else "None"
                 },
                 "ai_performance": ai_manager.get_recognition_stats() if ai_manager else {},
                 "productivity_metrics": {
-                    "gestures_per_minute": (sum(self.gesture_analytics.values()) / session_duration) * 60 if session_duration > 0 else 0,
-                    "drawing_efficiency": "High" if sum(self.gesture_analytics.values()) > 50 else "Medium" if sum(self.gesture_analytics.values()) > 20 else "Low"
+                    "gestures_per_minute": (self._gesture_total / session_duration) * 60 if session_duration > 0 else 0,
+                    "drawing_efficiency": "High" if self._gesture_total > 50 else "Medium" if self._gesture_total > 20 else "Low"
                 }
             }
             
             report_filename = f"session_report_{self.session_start_time.strftime('%Y%m%d_%H%M%S')}.json"
-            
-            with open(report_filename, 'w') as f:
-                json.dump(report, f, indent=2)
-            
+
+            self._io_pool.submit(self._write_json, report, report_filename, 2)
+
             return True, report_filename, report
             
         except Exception as e:
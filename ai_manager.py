@@ -1,8 +1,10 @@
 import google.generativeai as genai
+import numpy as np
 from PIL import Image
 import time
 import json
 import os
+from collections import OrderedDict, deque
 from datetime import datetime
 
 class AIManager:
@@ -10,18 +12,33 @@ class AIManager:
     def __init__(self):
         self.model = None
         self.api_configured = False
-        self.recognition_cache = {}
-        self.recognition_history = []
+        self.recognition_cache = OrderedDict()
+        self.cache_maxsize = 512
+        self.recognition_history = deque(maxlen=100)
         self.custom_prompts = {
             'simple': "What is this drawing? Respond with just the name of the object.",
             'detailed': "Analyze this drawing and provide a detailed description including what it might be, artistic style, and confidence level.",
             'creative': "Look at this drawing and tell me what creative story or idea it represents.",
             'educational': "Identify this drawing and provide educational information about the subject."
         }
+        self._prompt_suffix = (
+            "\n\nAdditional context:\n"
+            "- This is a hand-drawn sketch\n"
+            "- It may be simple or rough\n"
+            "- Focus on the main recognizable elements\n"
+            "- If uncertain, provide your best guess with confidence level"
+        )
+        self._expanded_prompts = {
+            name: prompt + self._prompt_suffix
+            for name, prompt in self.custom_prompts.items()
+        }
         self.current_prompt_type = 'simple'
         self.confidence_threshold = 0.7
         
-        self.history_file = "recognition_history.json"
+        self.history_file = "recognition_history.jsonl"
+        self._appends_since_rewrite = 0
+        self._proc_time_sum = 0.0
+        self._prompt_counts = {}
         self._load_history()
     
     def configure_api(self, api_key):
@@ -49,28 +66,19 @@ class AIManager:
         
         if pil_image is None:
             return "No image to analyze"
-        
+
+        if self._is_blank(pil_image):
+            return "(blank canvas)"
+
         try:
             cache_key = self._generate_cache_key(pil_image)
             if cache_key in self.recognition_cache:
+                self.recognition_cache.move_to_end(cache_key)
                 cached_result = self.recognition_cache[cache_key]
                 return f"{cached_result['result']} (cached)"
             
-            if custom_prompt:
-                prompt = custom_prompt
-            else:
-                prompt = self.custom_prompts[self.current_prompt_type]
-            
-            enhanced_prompt = f"""
-            {prompt}
-            
-            Additional context:
-            - This is a hand-drawn sketch
-            - It may be simple or rough
-            - Focus on the main recognizable elements
-            - If uncertain, provide your best guess with confidence level
-            """
-            
+            enhanced_prompt = self._build_prompt(custom_prompt)
+
             start_time = time.time()
             response = self.model.generate_content([enhanced_prompt, pil_image])
             processing_time = time.time() - start_time
@@ -83,6 +91,8 @@ class AIManager:
                     'timestamp': datetime.now().isoformat(),
                     'processing_time': processing_time
                 }
+                if len(self.recognition_cache) > self.cache_maxsize:
+                    self.recognition_cache.popitem(last=False)
                 
                 self._add_to_history(result, processing_time)
                 
@@ -95,11 +105,81 @@ class AIManager:
             print(error_msg)
             return f"{error_msg}"
     
+    def recognize_drawing_stream(self, pil_image, custom_prompt=None):
+        """Like recognize_drawing, but yields the accumulated text as it streams
+        from Gemini so the UI (e.g. st.write_stream) can show partial results."""
+        if not self.api_configured or not self.model:
+            yield "AI not configured. Please provide API key."
+            return
+
+        if pil_image is None:
+            yield "No image to analyze"
+            return
+
+        if self._is_blank(pil_image):
+            yield "(blank canvas)"
+            return
+
+        try:
+            cache_key = self._generate_cache_key(pil_image)
+            if cache_key in self.recognition_cache:
+                self.recognition_cache.move_to_end(cache_key)
+                yield f"{self.recognition_cache[cache_key]['result']} (cached)"
+                return
+
+            enhanced_prompt = self._build_prompt(custom_prompt)
+
+            start_time = time.time()
+            response = self.model.generate_content([enhanced_prompt, pil_image], stream=True)
+
+            parts = []
+            for chunk in response:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield ''.join(parts)
+            processing_time = time.time() - start_time
+
+            result = ''.join(parts).strip()
+            if result:
+                self.recognition_cache[cache_key] = {
+                    'result': result,
+                    'timestamp': datetime.now().isoformat(),
+                    'processing_time': processing_time
+                }
+                if len(self.recognition_cache) > self.cache_maxsize:
+                    self.recognition_cache.popitem(last=False)
+
+                self._add_to_history(result, processing_time)
+            else:
+                yield "No response from AI"
+
+        except Exception as e:
+            error_msg = f"AI recognition error: {str(e)}"
+            print(error_msg)
+            yield f"{error_msg}"
+
+    def _build_prompt(self, custom_prompt=None):
+        if custom_prompt:
+            return custom_prompt + self._prompt_suffix
+        return self._expanded_prompts[self.current_prompt_type]
+
+    def _is_blank(self, pil_image):
+        # Sample every 32nd pixel; near-zero variance means there is nothing
+        # drawn worth sending to the API.
+        try:
+            sampled = np.asarray(pil_image)[::32, ::32]
+            return float(sampled.std()) < 2.0
+        except Exception:
+            return False
+
     def _generate_cache_key(self, pil_image):
         try:
             import hashlib
-            img_bytes = pil_image.tobytes()
-            return hashlib.md5(img_bytes).hexdigest()
+            thumbnail = pil_image.resize((32, 32), Image.BILINEAR).convert('L')
+            arr = np.asarray(thumbnail)
+            if not arr.flags['C_CONTIGUOUS']:
+                arr = np.ascontiguousarray(arr)
+            return hashlib.blake2b(arr, digest_size=16).hexdigest()
         except:
             return str(time.time())
     
@@ -111,26 +191,50 @@ class AIManager:
             'prompt_type': self.current_prompt_type
         }
         
+        if len(self.recognition_history) == self.recognition_history.maxlen:
+            evicted = self.recognition_history[0]
+            self._proc_time_sum -= evicted.get('processing_time', 0)
+            prompt_type = evicted.get('prompt_type', 'unknown')
+            if self._prompt_counts.get(prompt_type):
+                self._prompt_counts[prompt_type] -= 1
+
         self.recognition_history.append(history_entry)
-        
-        if len(self.recognition_history) > 100:
-            self.recognition_history = self.recognition_history[-100:]
-        
-        self._save_history()
-    
+        self._proc_time_sum += history_entry['processing_time']
+        self._prompt_counts[self.current_prompt_type] = self._prompt_counts.get(self.current_prompt_type, 0) + 1
+
+        self._appends_since_rewrite += 1
+        if self._appends_since_rewrite >= 100:
+            self._save_history()
+            self._appends_since_rewrite = 0
+        else:
+            try:
+                with open(self.history_file, 'a') as f:
+                    f.write(json.dumps(history_entry) + '\n')
+            except Exception as e:
+                print(f"Error saving history: {e}")
+
     def _load_history(self):
         try:
             if os.path.exists(self.history_file):
                 with open(self.history_file, 'r') as f:
-                    self.recognition_history = json.load(f)
+                    self.recognition_history = deque(
+                        (json.loads(line) for line in f if line.strip()), maxlen=100)
+                self._proc_time_sum = sum(entry.get('processing_time', 0) for entry in self.recognition_history)
+                self._prompt_counts = {}
+                for entry in self.recognition_history:
+                    prompt_type = entry.get('prompt_type', 'unknown')
+                    self._prompt_counts[prompt_type] = self._prompt_counts.get(prompt_type, 0) + 1
         except Exception as e:
             print(f"Error loading history: {e}")
-            self.recognition_history = []
-    
+            self.recognition_history = deque(maxlen=100)
+            self._proc_time_sum = 0.0
+            self._prompt_counts = {}
+
     def _save_history(self):
         try:
             with open(self.history_file, 'w') as f:
-                json.dump(self.recognition_history, f, indent=2)
+                for entry in self.recognition_history:
+                    f.write(json.dumps(entry) + '\n')
         except Exception as e:
             print(f"Error saving history: {e}")
     
@@ -139,18 +243,13 @@ class AIManager:
             return {}
         
         total_recognitions = len(self.recognition_history)
-        avg_processing_time = sum(entry['processing_time'] for entry in self.recognition_history) / total_recognitions
-        
-        prompt_counts = {}
-        for entry in self.recognition_history:
-            prompt_type = entry.get('prompt_type', 'unknown')
-            prompt_counts[prompt_type] = prompt_counts.get(prompt_type, 0) + 1
-        
+        avg_processing_time = self._proc_time_sum / total_recognitions
+
         return {
             'total_recognitions': total_recognitions,
             'average_processing_time': round(avg_processing_time, 2),
             'cache_size': len(self.recognition_cache),
-            'prompt_type_usage': prompt_counts,
+            'prompt_type_usage': {k: v for k, v in self._prompt_counts.items() if v},
             'api_configured': self.api_configured
         }
     
@@ -160,6 +259,8 @@ class AIManager:
     
     def clear_history(self):
         self.recognition_history.clear()
+        self._proc_time_sum = 0.0
+        self._prompt_counts = {}
         try:
             if os.path.exists(self.history_file):
                 os.remove(self.history_file)
@@ -177,7 +278,7 @@ class AIManager:
                     json.dump({
                         'export_timestamp': datetime.now().isoformat(),
                         'total_entries': len(self.recognition_history),
-                        'history': self.recognition_history,
+                        'history': list(self.recognition_history),
                         'stats': self.get_recognition_stats()
                     }, f, indent=2)
                 return True, filename
@@ -1,20 +1,47 @@
 import cv2
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
 import os
 from PIL import Image
 
+@lru_cache(maxsize=32)
+def _parse_hex(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+try:
+    _HAVE_OPENCL = cv2.ocl.haveOpenCL()
+    if _HAVE_OPENCL:
+        cv2.ocl.setUseOpenCL(True)
+except Exception:
+    _HAVE_OPENCL = False
+
 class CanvasManager:
     
     def __init__(self):
         self.canvas = None
+        self.dirty_mask = None
+        self._combined_buf = None
         self.prev_pos = None
         self.brush_color = (255, 0, 255)
         self.brush_thickness = 10
         self.canvas_alpha = 0.3
         self.frame_alpha = 0.7
         self.total_points = 0
-        self.drawing_history = []
+        # Stroke history as a structured array (SoA): ~10 bytes per segment
+        # instead of a ~300-byte dict, and replayable with vectorized access.
+        self._stroke_dtype = np.dtype([('fx', 'i2'), ('fy', 'i2'),
+                                       ('tx', 'i2'), ('ty', 'i2'),
+                                       ('r', 'u1'), ('g', 'u1'), ('b', 'u1'),
+                                       ('th', 'u1')])
+        self._strokes = np.empty(1024, dtype=self._stroke_dtype)
+        self._stroke_count = 0
+        self._history_actions = 0
+        self._pending_pts = []
+        self.flush_threshold = 8
+        self._overlay_strip = None
+        self._overlay_key = None
         self.undo_stack = []
         self.max_undo_steps = 10
         
@@ -24,11 +51,12 @@ class CanvasManager:
     def initialize_canvas(self, shape):
         self.canvas = np.zeros(shape, dtype=np.uint8)
         self.canvas_shape = shape
+        self.dirty_mask = np.zeros(shape[:2], dtype=np.uint8)
+        self._combined_buf = np.empty(shape, dtype=np.uint8)
     
     def update_settings(self, brush_color="#FF00FF", brush_thickness=10, canvas_alpha=0.3):
-        brush_color = brush_color.lstrip('#')
-        rgb = tuple(int(brush_color[i:i+2], 16) for i in (0, 2, 4))
-        self.brush_color = (rgb[2], rgb[1], rgb[0])
+        # Canvas and combined output are RGB end to end, so no channel swap.
+        self.brush_color = _parse_hex(brush_color)
         self.brush_thickness = brush_thickness
         self.canvas_alpha = canvas_alpha
         self.frame_alpha = 1.0 - canvas_alpha
@@ -38,89 +66,187 @@ class CanvasManager:
             return
         
         try:
-            current_pos = tuple(map(int, current_pos))
-            
+            # Callers pass an int tuple already; see the draw site in main.py.
             if self.prev_pos is not None or force_draw:
                 if self.prev_pos is not None:
-                    cv2.line(self.canvas, self.prev_pos, current_pos, 
-                            self.brush_color, self.brush_thickness)
+                    # Buffer the polyline and rasterize several segments in a
+                    # single cv2.polylines call instead of one cv2.line each.
+                    if not self._pending_pts:
+                        self._pending_pts.append(self.prev_pos)
+                    self._pending_pts.append(current_pos)
+                    if len(self._pending_pts) >= self.flush_threshold:
+                        self._flush_pending()
                 else:
-                    cv2.circle(self.canvas, current_pos, 
+                    cv2.circle(self.canvas, current_pos,
                               self.brush_thickness // 2, self.brush_color, -1)
-                
+                    cv2.circle(self.dirty_mask, current_pos,
+                              self.brush_thickness // 2, 1, -1)
+
                 self.total_points += 1
-                self.drawing_history.append({
-                    'action': 'draw',
-                    'from': self.prev_pos,
-                    'to': current_pos,
-                    'color': self.brush_color,
-                    'thickness': self.brush_thickness
-                })
-            
+
             self.prev_pos = current_pos
-            
+
         except Exception as e:
             print(f"Drawing error: {e}")
-    
+
+    def _flush_pending(self):
+        if len(self._pending_pts) < 2:
+            self._pending_pts.clear()
+            return
+
+        pts = np.asarray(self._pending_pts, dtype=np.int32)
+        poly = pts.reshape(-1, 1, 2)
+        cv2.polylines(self.canvas, [poly], False, self.brush_color, self.brush_thickness)
+        cv2.polylines(self.dirty_mask, [poly], False, 1, self.brush_thickness)
+
+        self._record_segments(pts)
+        self._pending_pts.clear()
+
+    def _record_segments(self, pts):
+        n = len(pts) - 1
+        while self._stroke_count + n > len(self._strokes):
+            grown = np.empty(len(self._strokes) * 2, dtype=self._stroke_dtype)
+            grown[:self._stroke_count] = self._strokes[:self._stroke_count]
+            self._strokes = grown
+
+        records = self._strokes[self._stroke_count:self._stroke_count + n]
+        records['fx'] = pts[:-1, 0]
+        records['fy'] = pts[:-1, 1]
+        records['tx'] = pts[1:, 0]
+        records['ty'] = pts[1:, 1]
+        records['r'], records['g'], records['b'] = self.brush_color
+        records['th'] = self.brush_thickness
+
+        self._stroke_count += n
+        self._history_actions += 1
+
     def stop_drawing(self):
+        self._flush_pending()
         self.prev_pos = None
     
     def clear_canvas(self):
         if self.canvas is not None:
+            self._flush_pending()
             self._save_undo_state()
             
-            self.canvas = np.zeros_like(self.canvas)
+            self.canvas.fill(0)
+            self.dirty_mask.fill(0)
             self.prev_pos = None
             self.total_points = 0
-            self.drawing_history.append({'action': 'clear'})
+            self._history_actions += 1
     
     def _save_undo_state(self):
-        if self.canvas is not None:
-            self.undo_stack.append(self.canvas.copy())
-            if len(self.undo_stack) > self.max_undo_steps:
-                self.undo_stack.pop(0)
-    
+        if self.canvas is None:
+            return
+
+        # Snapshot only the bounding box of the drawn region; the rest of the
+        # canvas is black and costs nothing to restore.
+        ys, xs = np.nonzero(self.dirty_mask)
+        if ys.size == 0:
+            snapshot = None
+        else:
+            y0, y1 = int(ys.min()), int(ys.max()) + 1
+            x0, x1 = int(xs.min()), int(xs.max()) + 1
+            snapshot = ((y0, y1, x0, x1),
+                        self.canvas[y0:y1, x0:x1].copy(),
+                        self.dirty_mask[y0:y1, x0:x1].copy())
+
+        # Counters ride along so undo restores them exactly; clear_canvas
+        # snapshots before zeroing them.
+        self.undo_stack.append((snapshot, self.total_points, self._history_actions))
+        if len(self.undo_stack) > self.max_undo_steps:
+            self.undo_stack.pop(0)
+
     def undo_last_action(self):
-        if self.undo_stack:
-            self.canvas = self.undo_stack.pop()
+        if self.undo_stack and self.canvas is not None:
+            snapshot, total_points, history_actions = self.undo_stack.pop()
+            self.canvas[:] = 0
+            self.dirty_mask[:] = 0
+            if snapshot is not None:
+                (y0, y1, x0, x1), crop, mask_crop = snapshot
+                self.canvas[y0:y1, x0:x1] = crop
+                self.dirty_mask[y0:y1, x0:x1] = mask_crop
+            self.total_points = total_points
+            self._history_actions = history_actions
             return True
         return False
+
+    def _rebuild_dirty_mask(self):
+        if self.canvas is not None:
+            self.dirty_mask = self.canvas.any(axis=2).astype(np.uint8)
     
     def get_canvas(self):
         if self.canvas is None:
             return None
         
         try:
-            canvas_rgb = cv2.cvtColor(self.canvas, cv2.COLOR_BGR2RGB)
-            return Image.fromarray(canvas_rgb)
+            self._flush_pending()
+            return Image.fromarray(self.canvas)
         except Exception as e:
             print(f"Canvas conversion error: {e}")
             return None
-    
+
     def combine_with_frame(self, frame):
+        """Blend the RGB canvas over a BGR camera frame; returns an RGB image."""
         if self.canvas is None:
-            return frame
-        
+            # Still honor the RGB contract; the display renders channels="RGB".
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
         try:
-            if self.canvas.shape != frame.shape:
-                self.canvas = cv2.resize(self.canvas, (frame.shape[1], frame.shape[0]))
-            
-            combined = cv2.addWeighted(frame, self.frame_alpha, 
-                                     self.canvas, self.canvas_alpha, 0)
-            
-            self._add_info_overlay(combined)
-            
-            return combined
+            self._flush_pending()
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            if self.total_points == 0:
+                self._add_info_overlay(frame)
+                return frame
+
+            drawn = cv2.countNonZero(self.dirty_mask)
+            if drawn * 4 > self.dirty_mask.size:
+                # Dense canvas (e.g. a loaded image): a full addWeighted beats
+                # per-pixel fancy indexing. With OpenCL available, UMat
+                # dispatches the blend to the iGPU via OpenCV's T-API.
+                if _HAVE_OPENCL:
+                    frame = cv2.addWeighted(cv2.UMat(frame), self.frame_alpha,
+                                            cv2.UMat(self.canvas), self.canvas_alpha, 0).get()
+                else:
+                    if self._combined_buf is None or self._combined_buf.shape != frame.shape:
+                        self._combined_buf = np.empty_like(frame)
+                    cv2.addWeighted(frame, self.frame_alpha,
+                                    self.canvas, self.canvas_alpha, 0, dst=self._combined_buf)
+                    frame = self._combined_buf
+            else:
+                # The canvas is sparse (strokes on black), so only blend the
+                # pixels that were actually drawn. The cvtColor above already
+                # produced a buffer we own, so the blend writes straight into it.
+                idx = self.dirty_mask.view(bool)
+                frame[idx] = (frame[idx] * self.frame_alpha
+                              + self.canvas[idx] * self.canvas_alpha).astype(np.uint8)
+
+            self._add_info_overlay(frame)
+
+            return frame
             
         except Exception as e:
             print(f"Frame combination error: {e}")
             return frame
     
     def _add_info_overlay(self, img):
-        info_text = f"Points: {self.total_points} | Brush: {self.brush_thickness}px"
-        cv2.putText(img, info_text, (10, img.shape[0] - 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
+        # The text only changes when a point lands or the brush changes, so
+        # re-render the strip on those events and blit it otherwise.
+        key = (self.total_points, self.brush_thickness)
+        if key != self._overlay_key:
+            strip = np.zeros((30, 400, 3), dtype=np.uint8)
+            info_text = f"Points: {self.total_points} | Brush: {self.brush_thickness}px"
+            cv2.putText(strip, info_text, (0, 22),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            self._overlay_strip = strip
+            self._overlay_key = key
+
+        strip = self._overlay_strip
+        roi = img[img.shape[0] - 42:img.shape[0] - 12, 10:10 + strip.shape[1]]
+        strip = strip[:roi.shape[0], :roi.shape[1]]
+        np.copyto(roi, strip, where=strip > 0)
+
         cv2.circle(img, (img.shape[1] - 50, 30), 20, self.brush_color, -1)
         cv2.circle(img, (img.shape[1] - 50, 30), 20, (255, 255, 255), 2)
     
@@ -129,14 +255,15 @@ class CanvasManager:
             return False, "Nothing to save"
         
         try:
+            self._flush_pending()
+
             if filename is None:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"drawing_{timestamp}.png"
             
             filepath = os.path.join(self.drawings_dir, filename)
             
-            canvas_rgb = cv2.cvtColor(self.canvas, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(canvas_rgb)
+            pil_image = Image.fromarray(self.canvas)
             pil_image.save(filepath)
             
             return True, filepath
@@ -148,10 +275,22 @@ class CanvasManager:
         try:
             if os.path.exists(filepath):
                 pil_image = Image.open(filepath)
-                canvas_rgb = np.array(pil_image)
-                self.canvas = cv2.cvtColor(canvas_rgb, cv2.COLOR_RGB2BGR)
-                
-                self.total_points = np.count_nonzero(cv2.cvtColor(self.canvas, cv2.COLOR_BGR2GRAY))
+                loaded = np.array(pil_image.convert('RGB'))
+
+                # The blend paths assume the canvas matches the frame shape,
+                # so adapt mismatched drawings here, once, instead of per frame.
+                shape = getattr(self, 'canvas_shape', None)
+                if shape is not None and loaded.shape != tuple(shape):
+                    loaded = cv2.resize(loaded, (shape[1], shape[0]),
+                                        interpolation=cv2.INTER_AREA)
+                self.canvas = loaded
+                self.canvas_shape = loaded.shape
+                self._combined_buf = np.empty(loaded.shape, dtype=np.uint8)
+                self._pending_pts.clear()
+                self.prev_pos = None
+                self._rebuild_dirty_mask()
+
+                self.total_points = int(np.count_nonzero(self.dirty_mask))
                 
                 return True, "Drawing loaded successfully"
             else:
@@ -163,17 +302,17 @@ class CanvasManager:
     def get_drawing_statistics(self):
         if self.canvas is None:
             return {}
-        
-        gray_canvas = cv2.cvtColor(self.canvas, cv2.COLOR_BGR2GRAY)
-        total_pixels = gray_canvas.shape[0] * gray_canvas.shape[1]
-        drawn_pixels = np.count_nonzero(gray_canvas)
+
+        self._flush_pending()
+        total_pixels = self.canvas.shape[0] * self.canvas.shape[1]
+        drawn_pixels = int(np.count_nonzero(self.dirty_mask))
         coverage = (drawn_pixels / total_pixels) * 100
         
         return {
             'total_points': self.total_points,
             'drawn_pixels': drawn_pixels,
             'canvas_coverage': round(coverage, 2),
-            'drawing_actions': len(self.drawing_history),
+            'drawing_actions': self._history_actions,
             'canvas_size': f"{self.canvas.shape[1]}x{self.canvas.shape[0]}"
         }
     
@@ -182,18 +321,20 @@ class CanvasManager:
             return None
         
         try:
-            canvas_rgb = cv2.cvtColor(self.canvas, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(canvas_rgb)
-            
-            from io import BytesIO
+            self._flush_pending()
+
             import base64
-            
-            buffer = BytesIO()
-            pil_image.save(buffer, format='PNG')
-            img_data = base64.b64encode(buffer.getvalue()).decode()
-            
-            return img_data
-            
+
+            # imencode expects BGR; the reversed view avoids a cvtColor copy.
+            # Compression level 1 is much faster than the default and costs
+            # little extra size on line art.
+            success, buffer = cv2.imencode('.png', self.canvas[:, :, ::-1],
+                                           [cv2.IMWRITE_PNG_COMPRESSION, 1])
+            if not success:
+                return None
+
+            return base64.b64encode(buffer).decode()
+
         except Exception as e:
             print(f"Export error: {e}")
             return None
@@ -3,6 +3,38 @@ import numpy as np
 from cvzone.HandTrackingModule import HandDetector
 import time
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _smooth_and_classify(buf, buf_len, patterns):
+    """Majority-vote the finger ring buffer and match the result against the
+    gesture patterns in one pass. Compiled with Numba when available."""
+    smoothed = np.zeros(5, dtype=np.uint8)
+    for i in range(5):
+        total = 0
+        for j in range(buf_len):
+            total += buf[j, i]
+        if total > buf_len // 2:
+            smoothed[i] = 1
+
+    gesture_id = -1
+    for p in range(patterns.shape[0]):
+        match = True
+        for i in range(5):
+            if patterns[p, i] != smoothed[i]:
+                match = False
+                break
+        if match:
+            gesture_id = p
+            break
+
+    return smoothed, gesture_id
+
+if njit is not None:
+    _smooth_and_classify = njit(cache=True)(_smooth_and_classify)
+
 class HandGestureManager:
     
     def __init__(self):
@@ -16,8 +48,10 @@ class HandGestureManager:
         self.prev_gesture = None
         self.gesture_start_time = None
         self.gesture_threshold = 0.5
-        self.smoothing_buffer = []
         self.buffer_size = 5
+        self.smoothing_buffer = np.zeros((self.buffer_size, 5), dtype=np.uint8)
+        self._buffer_pos = 0
+        self._buffer_len = 0
         
         self.gesture_patterns = {
             'DRAW': [0, 1, 0, 0, 0],
@@ -27,6 +61,22 @@ class HandGestureManager:
             'STOP': [0, 0, 0, 0, 0],
             'IDLE': None
         }
+
+        self._pattern_lookup = {tuple(pattern): name
+                                for name, pattern in self.gesture_patterns.items()
+                                if pattern is not None}
+        self._pattern_names = [name for name, pattern in self.gesture_patterns.items()
+                               if pattern is not None]
+        self._pattern_array = np.array(
+            [self.gesture_patterns[name] for name in self._pattern_names], dtype=np.uint8)
+
+        # Static finger-name column rendered once; draw_gesture_info blits it
+        # instead of rasterizing five labels per frame.
+        self.finger_names = ['Thumb', 'Index', 'Middle', 'Ring', 'Pinky']
+        self._label_strip = np.zeros((150, 110, 3), dtype=np.uint8)
+        for i, name in enumerate(self.finger_names):
+            cv2.putText(self._label_strip, f"{name}:", (0, 20 + i * 30),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
     
     def update_settings(self, detection_confidence=0.7, tracking_confidence=0.5):
         self.detector = HandDetector(
@@ -37,28 +87,36 @@ class HandGestureManager:
             minTrackCon=tracking_confidence
         )
     
-    def detect_hands(self, img):
+    def detect_hands(self, img, draw=True):
         try:
-            hands, img_annotated = self.detector.findHands(img, draw=True, flipType=True)
+            hands, img_annotated = self.detector.findHands(img, draw=draw, flipType=True)
             
             if hands:
                 hand = hands[0]
                 landmarks = hand["lmList"]
                 fingers = self.detector.fingersUp(hand)
                 
-                self.smoothing_buffer.append(fingers)
-                if len(self.smoothing_buffer) > self.buffer_size:
-                    self.smoothing_buffer.pop(0)
-                
-                smoothed_fingers = self._get_smoothed_fingers()
-                gesture_name = self._classify_gesture(smoothed_fingers)
+                self.smoothing_buffer[self._buffer_pos] = fingers
+                self._buffer_pos = (self._buffer_pos + 1) % self.buffer_size
+                if self._buffer_len < self.buffer_size:
+                    self._buffer_len += 1
+
+                if njit is not None:
+                    smoothed, gesture_id = _smooth_and_classify(
+                        self.smoothing_buffer, self._buffer_len, self._pattern_array)
+                    smoothed_fingers = smoothed.tolist()
+                    gesture_name = self._pattern_names[gesture_id] if gesture_id >= 0 else 'UNKNOWN'
+                else:
+                    smoothed_fingers = self._get_smoothed_fingers()
+                    gesture_name = self._classify_gesture(smoothed_fingers)
                 
                 stable_gesture = self._check_gesture_stability(gesture_name)
                 
                 return smoothed_fingers, landmarks, stable_gesture
             
             else:
-                self.smoothing_buffer.clear()
+                self._buffer_len = 0
+                self._buffer_pos = 0
                 return None
                 
         except Exception as e:
@@ -66,21 +124,14 @@ class HandGestureManager:
             return None
     
     def _get_smoothed_fingers(self):
-        if not self.smoothing_buffer:
+        if self._buffer_len == 0:
             return [0, 0, 0, 0, 0]
-        
-        smoothed = []
-        for i in range(5):
-            finger_values = [fingers[i] for fingers in self.smoothing_buffer]
-            smoothed.append(1 if sum(finger_values) > len(finger_values) // 2 else 0)
-        
-        return smoothed
+
+        counts = self.smoothing_buffer[:self._buffer_len].sum(axis=0)
+        return (counts > self._buffer_len // 2).astype(int).tolist()
     
     def _classify_gesture(self, fingers):
-        for gesture_name, pattern in self.gesture_patterns.items():
-            if pattern is not None and fingers == pattern:
-                return gesture_name
-        return 'UNKNOWN'
+        return self._pattern_lookup.get(tuple(fingers), 'UNKNOWN')
     
     def _check_gesture_stability(self, current_gesture):
         current_time = time.time()
@@ -96,31 +147,32 @@ class HandGestureManager:
         return 'IDLE'
     
     def draw_gesture_info(self, img, gesture_name, fingers):
-        cv2.putText(img, f"Gesture: {gesture_name}", (10, 30), 
+        cv2.putText(img, f"Gesture: {gesture_name}", (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        finger_names = ['Thumb', 'Index', 'Middle', 'Ring', 'Pinky']
-        for i, (name, status) in enumerate(zip(finger_names, fingers)):
+
+        strip = self._label_strip
+        roi = img[50:50 + strip.shape[0], 10:10 + strip.shape[1]]
+        strip = strip[:roi.shape[0], :roi.shape[1]]
+        np.copyto(roi, strip, where=strip > 0)
+
+        for i, status in enumerate(fingers):
             color = (0, 255, 0) if status else (0, 0, 255)
-            cv2.putText(img, f"{name}: {'Up' if status else 'Down'}", 
-                       (10, 70 + i * 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        
+            cv2.putText(img, 'Up' if status else 'Down',
+                       (125, 70 + i * 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
         return img
     
     def get_gesture_confidence(self):
-        if len(self.smoothing_buffer) < self.buffer_size:
+        if self._buffer_len < self.buffer_size:
             return 0.0
-        
-        total_matches = 0
-        reference = self.smoothing_buffer[-1]
-        
-        for fingers in self.smoothing_buffer:
-            if fingers == reference:
-                total_matches += 1
-        
-        return total_matches / len(self.smoothing_buffer)
-    
+
+        reference = self.smoothing_buffer[self._buffer_pos - 1]
+        total_matches = int((self.smoothing_buffer == reference).all(axis=1).sum())
+
+        return total_matches / self.buffer_size
+
     def reset(self):
         self.prev_gesture = None
         self.gesture_start_time = None
-        self.smoothing_buffer.clear()
+        self._buffer_len = 0
+        self._buffer_pos = 0
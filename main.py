@@ -6,6 +6,8 @@ from cvzone.HandTrackingModule import HandDetector
 from PIL import Image
 import streamlit as st
 import os
+import queue
+import threading
 import time
 from datetime import datetime
 import json
@@ -55,6 +57,107 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Hand detection runs on a half-resolution frame; gesture classification does
+# not benefit from more pixels and MediaPipe cost scales with pixel count.
+DETECT_SCALE = 0.5
+
+# MediaPipe hand-skeleton topology, used to redraw the tracking overlay on
+# the full-resolution frame (detection annotates only the small copy).
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (17, 18), (18, 19), (19, 20),
+    (0, 17),
+)
+
+def draw_hand_overlay(frame, landmarks):
+    for start, end in HAND_CONNECTIONS:
+        cv2.line(frame, (landmarks[start][0], landmarks[start][1]),
+                 (landmarks[end][0], landmarks[end][1]), (255, 255, 255), 2)
+    for lm in landmarks:
+        cv2.circle(frame, (lm[0], lm[1]), 4, (255, 0, 255), -1)
+
+class FramePipeline:
+    """Runs camera capture and hand detection in background threads so each
+    Streamlit rerun only pays for the blend and display, overlapping the
+    camera wait with MediaPipe inference."""
+
+    def __init__(self, cap, hand_manager):
+        self.cap = cap
+        self.hand_manager = hand_manager
+        self._frames = queue.Queue(maxsize=2)
+        self._results = queue.Queue(maxsize=2)
+        self._stop = threading.Event()
+        self._delivered_first = False
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._detect_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        self._capture_thread.start()
+        self._detect_thread.start()
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            frame = cv2.flip(frame, 1)
+            self._put_latest(self._frames, frame)
+
+    def _detect_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame = self._frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            small = cv2.resize(frame, None, fx=DETECT_SCALE, fy=DETECT_SCALE,
+                               interpolation=cv2.INTER_LINEAR)
+            # The small frame is thrown away, so skip findHands' annotation
+            # there and redraw the skeleton on the frame that is displayed.
+            hand_info = self.hand_manager.detect_hands(small, draw=False)
+            if hand_info:
+                fingers, landmarks, gesture_name = hand_info
+                inv = 1.0 / DETECT_SCALE
+                landmarks = [[int(lm[0] * inv), int(lm[1] * inv), *lm[2:]]
+                             for lm in landmarks]
+                hand_info = (fingers, landmarks, gesture_name)
+                draw_hand_overlay(frame, landmarks)
+            self._put_latest(self._results, (frame, hand_info))
+
+    @staticmethod
+    def _put_latest(q, item):
+        # Drop the oldest entry rather than block, to keep latency bounded.
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def latest(self, timeout=1.0, first_timeout=10.0):
+        # The first result has to wait out MediaPipe graph warm-up (and the
+        # optional Numba compile), which can take several seconds; a healthy
+        # camera should not report failure during that window.
+        if not self._delivered_first:
+            timeout = first_timeout
+        try:
+            result = self._results.get(timeout=timeout)
+            self._delivered_first = True
+            return result
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        # Wait for the capture thread to leave cap.read() before the caller
+        # releases the VideoCapture; releasing mid-read can crash natively.
+        self._stop.set()
+        self._capture_thread.join(timeout=2.0)
+        self._detect_thread.join(timeout=2.0)
+
 def initialize_session_state():
     if 'canvas_manager' not in st.session_state:
         st.session_state.canvas_manager = CanvasManager()
@@ -157,6 +260,16 @@ def main():
     )
     
     if run:
+        if (st.session_state.camera_initialized
+                and st.session_state.get('camera_index') != settings['camera_index']):
+            # Camera changed: tear down so the block below reopens it and
+            # reinitializes the canvas at the new resolution.
+            if 'pipeline' in st.session_state:
+                st.session_state.pipeline.stop()
+                del st.session_state['pipeline']
+            st.session_state.cap.release()
+            st.session_state.camera_initialized = False
+
         if not st.session_state.camera_initialized:
             try:
                 cap = cv2.VideoCapture(settings['camera_index'])
@@ -165,30 +278,32 @@ def main():
                     return
                 st.session_state.cap = cap
                 st.session_state.camera_initialized = True
+                st.session_state.camera_index = settings['camera_index']
                 
                 ret, frame = cap.read()
                 if ret:
                     frame = cv2.flip(frame, 1)
                     st.session_state.canvas_manager.initialize_canvas(frame.shape)
-                    
+
+                st.session_state.pipeline = FramePipeline(
+                    cap, st.session_state.hand_manager)
+
             except Exception as e:
                 st.error(f"Camera initialization failed: {str(e)}")
                 return
-        
+
         if st.session_state.camera_initialized:
-            cap = st.session_state.cap
-            ret, frame = cap.read()
-            
-            if ret:
-                frame = cv2.flip(frame, 1)
-                
-                hand_info = st.session_state.hand_manager.detect_hands(frame)
-                
+            result = st.session_state.pipeline.latest()
+
+            if result is not None:
+                frame, hand_info = result
+
                 if hand_info:
                     fingers, landmarks, gesture_name = hand_info
                     
                     if gesture_name == "DRAW":
-                        st.session_state.canvas_manager.draw_point(landmarks[8][:2])
+                        lm = landmarks[8]
+                        st.session_state.canvas_manager.draw_point((int(lm[0]), int(lm[1])))
                     elif gesture_name == "CLEAR":
                         st.session_state.canvas_manager.clear_canvas()
                     elif gesture_name == "RECOGNIZE":
@@ -207,7 +322,7 @@ def main():
                 
                 combined_frame = st.session_state.canvas_manager.combine_with_frame(frame)
                 
-                FRAME_WINDOW.image(combined_frame, channels="BGR", use_column_width=True)
+                FRAME_WINDOW.image(combined_frame, channels="RGB", use_column_width=True)
                 
                 if hand_info:
                     status_html = f'<div class="status-box status-connected">Hand detected - Gesture: {gesture_name}</div>'
@@ -235,6 +350,9 @@ def main():
     
     else:
         if st.session_state.camera_initialized:
+            if 'pipeline' in st.session_state:
+                st.session_state.pipeline.stop()
+                del st.session_state['pipeline']
             st.session_state.cap.release()
             st.session_state.camera_initialized = False
     